@@ -1,7 +1,13 @@
 import json
 import argparse
+import os
 import sys
-import pandas as pd
+from collections import defaultdict
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Any
+
+import msgspec
 
 # Define the expected datasets and their main metrics
 expected_datasets_metrics = {
@@ -17,67 +23,243 @@ expected_datasets_metrics = {
     "speed": "Not printed"
 }
 
-#linguistic_datasets = ["norec", "scala-nn", "no-sammendrag"]
-#logical_datasets = ["norquad", "mmlu-no", "hellaswag-no"]
-linguistic_datasets = ["norec", "scala-nn"]
-logical_datasets = ["mmlu-no", "hellaswag-no"]
+#linguistic_datasets = frozenset({"norec", "scala-nn", "no-sammendrag"})
+#logical_datasets = frozenset({"norquad", "mmlu-no", "hellaswag-no"})
+linguistic_datasets = frozenset({"norec", "scala-nn"})
+logical_datasets = frozenset({"mmlu-no", "hellaswag-no"})
 
+# Cache of (base_key, se_key) pairs and their base keys alone per (dataset, metric keys) signature
+_pair_cache = {}
 
+def _metric_pairs(dataset, total_fields):
+    signature = (dataset, tuple(total_fields))
+    cached = _pair_cache.get(signature)
+    if cached is None:
+        pairs = [(k[:-3], k) for k in total_fields if k.endswith('_se') and k[:-3] in total_fields]
+        cached = _pair_cache[signature] = (pairs, [base_key for base_key, _ in pairs])
+    return cached
 
-def extract_all_results(file_path, output_se, all_metrics):
+@lru_cache(maxsize=4096)
+def _q2_cached(x):
+    return f"{x:.2f}"
+
+def _q2(x):
+    # Metric and SE values repeat a lot across runs, so the formatted strings are cached.
+    # 0.0 and -0.0 share a cache entry but format differently, so zeros bypass the cache.
+    if not x:
+        return f"{x:.2f}"
+    return _q2_cached(x)
+
+class _ModelBucket:
+    """Per-model rows: dataset names and their display strings."""
+    __slots__ = ('datasets', 'results')
+
+    def __init__(self):
+        self.datasets = []
+        self.results = []
+
+def _new_summary_acc():
+    # Raw metric and SE floats of the linguistic ("ling") and logical ("log") datasets
+    return {"ling": [], "log": [], "ling_se": [], "log_se": []}
+
+# Only the fields read below are decoded; everything else in a row (results.raw,
+# model configuration, ...) is skipped by the decoder
+class _Results(msgspec.Struct):
+    total: dict = {}
+
+class _Row(msgspec.Struct):
+    # Left untyped so any JSON value is accepted, as with a plain dict lookup
+    model: Any = None
+    dataset: Any = None
+    # Kept raw so results is only decoded for rows that are scored, not for
+    # speed or unknown-dataset rows that are skipped anyway
+    results: msgspec.Raw = msgspec.Raw(b"{}")
+
+_row_decoder = msgspec.json.Decoder(_Row)
+_results_decoder = msgspec.json.Decoder(_Results)
+
+# Files smaller than this are parsed in a single process
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+def _extract_range(file_path, start, end, output_se, all_metrics):
+    """Parse the lines starting in the byte range [start, end) of the file."""
     results_dict = {}
     existing_models = set()
     unknown_datasets = set()
     unknown_metrics = set()
     conflicts = {}
+    # First result per (model, dataset), in file order
+    rows = {}
+    summary_acc = defaultdict(_new_summary_acc)
 
-    with open(file_path, 'r') as file:
-        for line in file:
-            if line.strip():  # Skip empty lines
-                data = json.loads(line)
-                model_name = data.get('model')
-                existing_models.add(model_name)
-                dataset = data.get('dataset')
+    # Bind hot-loop lookups to locals once instead of resolving them per line
+    _metrics_get = expected_datasets_metrics.get
+    rows_get = rows.get
+    _decode = _row_decoder.decode
+    _decode_results = _results_decoder.decode
+
+    with open(file_path, 'rb') as file:
+        if start:
+            # Step back one byte so a line starting exactly at start is kept
+            file.seek(start - 1)
+            position = start - 1 + len(file.readline())
+        else:
+            position = 0
+        while end is None or position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            # Rows normally start with '{'; anything else is only decoded if it is not blank
+            if line.startswith(b"{") or line.strip():  # Skip blank and whitespace-only lines
+                try:
+                    row = _decode(line)
+                except msgspec.DecodeError:
+                    # msgspec rejects the NaN/Infinity tokens that json.dumps writes,
+                    # so such rows go through the standard library parser instead
+                    data = json.loads(line)
+                    row = _Row(data.get('model'), data.get('dataset'), data.get('results', {}))
+                model_name = row.model
+                dataset = row.dataset
 
-                if dataset not in expected_datasets_metrics:
+                metric_key = _metrics_get(dataset)
+                if metric_key is None:
                     unknown_datasets.add(dataset)
                     continue
+                if dataset == "speed":
+                    continue
 
-                if model_name not in results_dict:
-                    results_dict[model_name] = {"Dataset": [], model_name: []}
+                existing_models.add(model_name)
 
-                if dataset and dataset != "speed":
-                    metric_key = expected_datasets_metrics[dataset]
-                    total_fields = data.get('results', {}).get('total', {})
-                    combined_results = []
+                results = row.results
+                if isinstance(results, msgspec.Raw):
+                    total_fields = _decode_results(results).total
+                else:
+                    total_fields = results.get('total', {})
 
-                    if all_metrics:
-                        for k, v in total_fields.items():
-                            if k.endswith('_se'):
-                                base_key = k[:-3]
-                                if base_key in total_fields:
-                                    if output_se:
-                                        combined_value = f"{round(total_fields[base_key], 2)} ± {round(v, 2)}"
-                                    else:
-                                        combined_value = f"{round(total_fields[base_key], 2)}"
-                                    combined_results.append(combined_value)
+                if all_metrics:
+                    # The cached key lists give the row length up front, so the
+                    # per-row lists are preallocated and filled by index
+                    pairs, bases = _metric_pairs(dataset, total_fields)
+                    if output_se:
+                        n = len(pairs)
+                        combined_results = [None] * n
+                        # Raw floats for the summary averages
+                        values = [None] * n
+                        ses = [None] * n
+                        for i, (base_key, se_key) in enumerate(pairs):
+                            base_value = values[i] = total_fields[base_key]
+                            se_value = ses[i] = total_fields[se_key]
+                            combined_results[i] = f"{_q2(base_value)} ± {_q2(se_value)}"
                     else:
-                        base_value = total_fields.get(metric_key)
-                        se_value = total_fields.get(f"{metric_key}_se")
-                        if base_value is not None:
-                            if output_se and se_value is not None:
-                                combined_value = f"{round(base_value, 2)} ± {round(se_value, 2)}"
-                            else:
-                                combined_value = f"{round(base_value, 2)}"
-                            combined_results.append(combined_value)
+                        n = len(bases)
+                        combined_results = [None] * n
+                        values = [None] * n
+                        ses = []
+                        for i, base_key in enumerate(bases):
+                            base_value = values[i] = total_fields[base_key]
+                            combined_results[i] = _q2(base_value)
+                else:
+                    combined_results = []
+                    values = []
+                    ses = []
+                    base_value = total_fields.get(metric_key)
+                    se_value = total_fields.get(f"{metric_key}_se")
+                    if base_value is not None:
+                        values.append(base_value)
+                        if output_se and se_value is not None:
+                            ses.append(se_value)
+                            combined_value = f"{_q2(base_value)} ± {_q2(se_value)}"
                         else:
-                            unknown_metrics.add(f"{dataset}: {metric_key}")
-
-                    if dataset in results_dict[model_name]["Dataset"]:
-                        conflicts.setdefault(model_name, {}).setdefault(dataset, []).append(' / '.join(combined_results))
+                            combined_value = _q2(base_value)
+                        combined_results.append(combined_value)
                     else:
-                        results_dict[model_name]["Dataset"].append(dataset)
-                        results_dict[model_name][model_name].append(' / '.join(combined_results))
+                        unknown_metrics.add(f"{dataset}: {metric_key}")
+
+                key = (model_name, dataset)
+                if rows_get(key) is None:
+                    rows[key] = ' / '.join(combined_results)
+                    acc = summary_acc[model_name]
+                    if dataset in linguistic_datasets:
+                        acc["ling"].extend(values)
+                        acc["ling_se"].extend(ses)
+                    elif dataset in logical_datasets:
+                        acc["log"].extend(values)
+                        acc["log_se"].extend(ses)
+                else:
+                    conflicts.setdefault(model_name, {}).setdefault(dataset, []).append(' / '.join(combined_results))
+
+    # Buckets are only created for models that have at least one stored row
+    for (model_name, dataset), result in rows.items():
+        bucket = results_dict.get(model_name)
+        if bucket is None:
+            bucket = results_dict[model_name] = _ModelBucket()
+        bucket.datasets.append(dataset)
+        bucket.results.append(result)
+
+    return results_dict, summary_acc, existing_models, unknown_datasets, unknown_metrics, conflicts
+
+def _merge_partials(partials):
+    """Merge per-range extraction results in file order, detecting conflicts across ranges."""
+    results_dict = {}
+    summary_acc = defaultdict(_new_summary_acc)
+    existing_models = set()
+    unknown_datasets = set()
+    unknown_metrics = set()
+    conflicts = {}
+
+    for part_results, part_acc, part_models, part_datasets, part_metrics, part_conflicts in partials:
+        existing_models |= part_models
+        unknown_datasets |= part_datasets
+        unknown_metrics |= part_metrics
+
+        # A (model, dataset) pair seen in two ranges is a conflict and aborts the run,
+        # so the accumulated floats can simply be concatenated
+        for model_name, acc in part_acc.items():
+            merged_acc = summary_acc[model_name]
+            for group, floats in acc.items():
+                merged_acc[group].extend(floats)
+
+        for model_name, data in part_results.items():
+            merged = results_dict.get(model_name)
+            if merged is None:
+                results_dict[model_name] = data
+                continue
+            ds_list = merged.datasets
+            seen = set(ds_list)
+            val_list = merged.results
+            for dataset, result in zip(data.datasets, data.results):
+                if dataset in seen:
+                    conflicts.setdefault(model_name, {}).setdefault(dataset, []).append(result)
+                else:
+                    seen.add(dataset)
+                    ds_list.append(dataset)
+                    val_list.append(result)
+
+        for model_name, datasets in part_conflicts.items():
+            for dataset, values in datasets.items():
+                conflicts.setdefault(model_name, {}).setdefault(dataset, []).extend(values)
+
+    return results_dict, summary_acc, existing_models, unknown_datasets, unknown_metrics, conflicts
+
+def extract_all_results(file_path, output_se, all_metrics):
+    file_size = os.path.getsize(file_path)
+    # Count the CPUs this process may run on (taskset, container limits), not the host's
+    if hasattr(os, "sched_getaffinity"):
+        num_workers = len(os.sched_getaffinity(0))
+    else:
+        num_workers = os.cpu_count() or 1
+
+    if file_size < PARALLEL_MIN_BYTES or num_workers < 2:
+        partials = [_extract_range(file_path, 0, None, output_se, all_metrics)]
+    else:
+        chunk_size = -(-file_size // num_workers)
+        ranges = [(file_path, start, min(start + chunk_size, file_size), output_se, all_metrics)
+                  for start in range(0, file_size, chunk_size)]
+        with Pool(num_workers) as pool:
+            partials = pool.starmap(_extract_range, ranges)
+
+    results_dict, summary_acc, existing_models, unknown_datasets, unknown_metrics, conflicts = _merge_partials(partials)
 
     if conflicts:
         print("Error: Conflicts found for the following models and datasets:")
@@ -91,34 +273,28 @@ def extract_all_results(file_path, output_se, all_metrics):
     if unknown_metrics:
         print(f"Warning: Missing metrics for some datasets: {', '.join(unknown_metrics)}")
 
-    return results_dict, existing_models
+    return results_dict, existing_models, summary_acc
 
-def calculate_summary(results_dict, output_se):
+def calculate_summary(summary_acc, output_se):
     summary = {}
-    for model_name, data in results_dict.items():
-        linguistic_scores = []
-        logical_scores = []
-
-        for dataset, result in zip(data["Dataset"], data[model_name]):
-            score_parts = result.split(" / ")
-            scores = [float(part.split(" ± ")[0]) for part in score_parts]
-            if dataset in linguistic_datasets:
-                linguistic_scores.extend(scores)
-            elif dataset in logical_datasets:
-                logical_scores.extend(scores)
+    for model_name, acc in summary_acc.items():
+        linguistic_scores = acc["ling"]
+        logical_scores = acc["log"]
+        linguistic_ses = acc["ling_se"]
+        logical_ses = acc["log_se"]
 
         if linguistic_scores:
             linguistic_avg = round(sum(linguistic_scores) / len(linguistic_scores), 2)
             summary.setdefault(model_name, {})["Linguistic Average"] = linguistic_avg
-            if output_se:
-                linguistic_se = round(sum([float(part.split(" ± ")[1]) for part in score_parts if " ± " in part]) / len(score_parts), 2)
+            if output_se and linguistic_ses:
+                linguistic_se = round(sum(linguistic_ses) / len(linguistic_ses), 2)
                 summary[model_name]["Linguistic SE"] = linguistic_se
 
         if logical_scores:
             logical_avg = round(sum(logical_scores) / len(logical_scores), 2)
             summary.setdefault(model_name, {})["Logical Average"] = logical_avg
-            if output_se:
-                logical_se = round(sum([float(part.split(" ± ")[1]) for part in score_parts if " ± " in part]) / len(score_parts), 2)
+            if output_se and logical_ses:
+                logical_se = round(sum(logical_ses) / len(logical_ses), 2)
                 summary[model_name]["Logical SE"] = logical_se
 
     return summary
@@ -126,7 +302,7 @@ def calculate_summary(results_dict, output_se):
 def save_jsonl_output(results_dict, summary, jsonl_output_file, jsonl_summary_file):
     with open(jsonl_output_file, 'w') as file:
         for model_name, data in results_dict.items():
-            for dataset, result in zip(data["Dataset"], data[model_name]):
+            for dataset, result in zip(data.datasets, data.results):
                 line = {
                     "model": model_name,
                     "dataset": dataset,
@@ -146,23 +322,29 @@ def save_jsonl_output(results_dict, summary, jsonl_output_file, jsonl_summary_fi
 def format_markdown_table(results_dict):
     tables = []
     for model_name, data in results_dict.items():
-        datasets = data["Dataset"]
-        results = data[model_name]
-        table = f"| Dataset | {model_name} |\n|:--------|:-------------|\n"
-        for dataset, result in zip(datasets, results):
-            table += f"| {dataset} | {result} |\n"
-        tables.append(table)
+        datasets = data.datasets
+        results = data.results
+        rows = [f"| Dataset | {model_name} |", "|:--------|:-------------|"]
+        rows.extend(f"| {dataset} | {result} |" for dataset, result in zip(datasets, results))
+        rows.append("")  # Keep the trailing newline after the last row
+        tables.append("\n".join(rows))
     return "\n\n".join(tables)
 
 def display_nicely(results_dict):
+    parts = []
     for model_name, data in results_dict.items():
-        df = pd.DataFrame(data)
-        if df.empty:
-            print(f"Results for {model_name} are empty.\n")
-        else:
-            print(f"Results for {model_name}:\n")
-            print(df.to_string(index=False))
-            print("\n")
+        datasets = data.datasets
+        results = data.results
+        # Right-aligned columns, matching the layout of DataFrame.to_string(index=False)
+        w = max(len(d) for d in datasets + ["Dataset"])
+        header = str(model_name)  # Model names are not guaranteed to be strings
+        w2 = max(len(r) for r in results + [header])
+        parts.append(f"Results for {model_name}:\n\n")
+        parts.append(f"{'Dataset':>{w}} {header:>{w2}}\n")
+        for d, r in zip(datasets, results):
+            parts.append(f"{d:>{w}} {r:>{w2}}\n")
+        parts.append("\n\n")
+    return "".join(parts)
 
 def main():
     parser = argparse.ArgumentParser(description="Extract results from JSONL file for all models.")
@@ -177,27 +359,32 @@ def main():
 
     args = parser.parse_args()
 
-    results_dict, existing_models = extract_all_results(args.input_file, args.output_se, args.all_metrics)
+    results_dict, existing_models, summary_acc = extract_all_results(args.input_file, args.output_se, args.all_metrics)
 
     if not args.no_summary or args.only_summary:
-        summary = calculate_summary(results_dict, args.output_se)
+        summary = calculate_summary(summary_acc, args.output_se)
 
     if args.jsonl_output_file:
         save_jsonl_output(results_dict, summary, args.jsonl_output_file, args.jsonl_summary_file)
 
+    # Collect the output and write it in one go rather than printing line by line
+    parts = []
+
     if not args.only_summary:
         if args.markdown:
-            markdown_output = format_markdown_table(results_dict)
-            print(markdown_output)
+            parts.append(format_markdown_table(results_dict))
+            parts.append("\n")
         else:
-            display_nicely(results_dict)
+            parts.append(display_nicely(results_dict))
 
     if not args.no_summary:
-        print("\nSummary of Scores:")
+        parts.append("\nSummary of Scores:\n")
         for model_name, scores in summary.items():
-            print(f"Model: {model_name}")
+            parts.append(f"Model: {model_name}\n")
             for score_type, value in scores.items():
-                print(f"  {score_type}: {value}")
+                parts.append(f"  {score_type}: {value}\n")
+
+    sys.stdout.write("".join(parts))
 
 if __name__ == "__main__":
     main()